@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 import os
+import queue
 import time
 import sqlite3
-from dataclasses import dataclass
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import orjson
 import requests
@@ -32,6 +35,7 @@ WEAVIATE_GRPC_SECURE = os.getenv("WEAVIATE_GRPC_SECURE", "0").strip() in ("1", "
 USE_WEAVIATE = os.getenv("USE_WEAVIATE", "1").strip() not in ("0", "false", "False")
 WEAVIATE_FETCH_LIMIT = int(os.getenv("WEAVIATE_FETCH_LIMIT", "10000"))
 DEFAULT_MAX_TEXT_LEN = int(os.getenv("DEFAULT_MAX_TEXT_LEN", "2000"))
+DB_READ_POOL_SIZE = int(os.getenv("MCP_DB_READ_POOL_SIZE", "8"))
 
 
 @dataclass
@@ -49,7 +53,7 @@ class ChunkSummary:
     dup_count: int
 
 
-@dataclass
+@dataclass(frozen=True)
 class SearchParams:
     repo: Optional[str] = None
     path_contains: Optional[str] = None
@@ -71,7 +75,7 @@ class SearchParams:
     sort_order: str = "desc"
 
 
-@dataclass
+@dataclass(frozen=True)
 class DupListParams:
     min_count: int = 2
     limit: int = 50
@@ -166,9 +170,113 @@ def dup_counts() -> Dict[str, int]:
 
 # --- SQLite annotations ---
 
+_CONN_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+)
+
+_conns: List[sqlite3.Connection] = []
+_conns_lock = threading.Lock()
+# Bumped by _close_conns(); read connections borrowed under an older generation
+# are dropped instead of going back to the pool.
+_conn_generation = 0
+_write_lock = threading.Lock()
+_writer: Optional[sqlite3.Connection] = None
+
+
+@contextmanager
+def _write_conn() -> Iterator[sqlite3.Connection]:
+    """Run one write transaction on the process's single write connection.
+
+    SQLite serializes writers anyway, so threads queue on a lock rather than each
+    opening a connection that outlives the (short-lived) threadpool worker.
+    """
+    global _writer
+    with _write_lock:
+        if _writer is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            for pragma in _CONN_PRAGMAS:
+                conn.execute(pragma)
+            with _conns_lock:
+                _conns.append(conn)
+            _writer = conn
+        with _writer as conn:
+            yield conn
+
+
+# Reads borrow from a bounded pool of read-only connections shared by all threads;
+# under WAL they never block the writer or each other. Writes go through _write_conn().
+_read_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+_read_opened = 0
+
+
+def _open_read_conn() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH.as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+    for pragma in _CONN_PRAGMAS:
+        conn.execute(pragma)
+    with _conns_lock:
+        _conns.append(conn)
+    return conn
+
+
+@contextmanager
+def _read_conn() -> Iterator[sqlite3.Connection]:
+    """Borrow a read-only connection, opening one lazily until the pool is full."""
+    global _read_opened
+    generation = _conn_generation
+    try:
+        conn = _read_pool.get_nowait()
+    except queue.Empty:
+        with _conns_lock:
+            may_open = _read_opened < DB_READ_POOL_SIZE
+            if may_open:
+                _read_opened += 1
+        if may_open:
+            try:
+                conn = _open_read_conn()
+            except Exception:
+                # Give the slot back, or a few failed opens (the file briefly
+                # missing) would leave every later read waiting on an empty pool.
+                with _conns_lock:
+                    _read_opened -= 1
+                raise
+        else:
+            conn = _read_pool.get()
+    try:
+        yield conn
+    finally:
+        if generation == _conn_generation:
+            _read_pool.put(conn)
+
+
+def _close_conns() -> None:
+    global _read_opened, _conn_generation, _writer
+    with _write_lock:
+        _writer = None
+    with _conns_lock:
+        conns = list(_conns)
+        _conns.clear()
+        _read_opened = 0
+        _conn_generation += 1
+    while True:
+        try:
+            _read_pool.get_nowait()
+        except queue.Empty:
+            break
+    for conn in conns:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
 def init_db() -> None:
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     with sqlite3.connect(DB_PATH) as conn:
+        # WAL is persistent in the database file; readers no longer block on writers.
+        conn.execute("PRAGMA journal_mode=WAL")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS annotations (
@@ -189,9 +297,29 @@ def init_db() -> None:
             conn.execute("ALTER TABLE annotations ADD COLUMN human_priority INTEGER")
         if "ai_priority" not in cols:
             conn.execute("ALTER TABLE annotations ADD COLUMN ai_priority INTEGER")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_annotations_status "
+            "ON annotations (session_id, target_type, status, target_id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_annotations_updated "
+            "ON annotations (session_id, updated_at)"
+        )
         conn.commit()
 
 
+_UPSERT_SQL = """
+    INSERT INTO annotations (session_id, target_type, target_id, status, human_priority, ai_priority, comment, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(session_id, target_type, target_id)
+    DO UPDATE SET status=COALESCE(excluded.status, annotations.status),
+                  human_priority=COALESCE(excluded.human_priority, annotations.human_priority),
+                  ai_priority=COALESCE(excluded.ai_priority, annotations.ai_priority),
+                  comment=COALESCE(excluded.comment, annotations.comment),
+                  updated_at=excluded.updated_at
+"""
+
+
 def _upsert_annotation(
     conn: sqlite3.Connection,
     args: AnnotationSetParams,
@@ -200,44 +328,40 @@ def _upsert_annotation(
     ai_priority: Optional[int],
 ) -> None:
     conn.execute(
-        """
-        INSERT INTO annotations (session_id, target_type, target_id, status, human_priority, ai_priority, comment, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(session_id, target_type, target_id)
-        DO UPDATE SET status=COALESCE(excluded.status, annotations.status),
-                      human_priority=COALESCE(excluded.human_priority, annotations.human_priority),
-                      ai_priority=COALESCE(excluded.ai_priority, annotations.ai_priority),
-                      comment=COALESCE(excluded.comment, annotations.comment),
-                      updated_at=excluded.updated_at
-        """,
+        _UPSERT_SQL,
         (SESSION_ID, args.target_type, args.target_id, args.status, human_priority, ai_priority, args.comment, now),
     )
 
 
+def bulk_set_annotation_status(
+    target_type: str,
+    target_ids: Iterable[str],
+    status: Optional[str],
+    comment: Optional[str] = None,
+) -> int:
+    """Upsert status/comment for many targets in one write transaction; returns the row count."""
+    now = time.time()
+    rows = [(SESSION_ID, target_type, tid, status, None, None, comment, now) for tid in target_ids if tid]
+    if not rows:
+        return 0
+    with _write_conn() as conn:
+        # Take the write lock up front so the batch never has to upgrade mid-way.
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(_UPSERT_SQL, rows)
+    return len(rows)
+
+
 def set_annotation(args: AnnotationSetParams) -> Dict[str, Any]:
     now = time.time()
     ai_priority = args.ai_priority if args.ai_priority is not None else args.priority
     human_priority = args.human_priority if ALLOW_HUMAN_PRIORITY_UPDATE else None
-    with sqlite3.connect(DB_PATH) as conn:
-        if args.target_type == "dup_group":
-            group = get_dup_group(DupGetParams(fingerprint=args.target_id, include_chunks=False, chunk_text_max=0))
-            if group:
-                for cid in group.get("chunk_ids", []):
-                    _upsert_annotation(
-                        conn,
-                        AnnotationSetParams(
-                            target_type="chunk",
-                            target_id=cid,
-                            status=args.status,
-                            comment=args.comment,
-                        ),
-                        now,
-                        None,
-                        None,
-                    )
-        else:
+    if args.target_type == "dup_group":
+        group = get_dup_group(DupGetParams(fingerprint=args.target_id, include_chunks=False, chunk_text_max=0))
+        if group:
+            bulk_set_annotation_status("chunk", group.get("chunk_ids", []), args.status, args.comment)
+    else:
+        with _write_conn() as conn:
             _upsert_annotation(conn, args, now, human_priority, ai_priority)
-        conn.commit()
     current = get_annotation(AnnotationGetParams(target_type=args.target_type, target_id=args.target_id)) or {}
     return {
         **current,
@@ -254,7 +378,7 @@ def _fetch_chunk_rows(chunk_ids: List[str]) -> List[Tuple[str, Optional[str], Op
         f"WHERE session_id=? AND target_type='chunk' AND target_id IN ({placeholders})"
     )
     params: List[Any] = [SESSION_ID, *chunk_ids]
-    with sqlite3.connect(DB_PATH) as conn:
+    with _read_conn() as conn:
         return conn.execute(q, params).fetchall()
 
 
@@ -293,7 +417,7 @@ def _derive_group_annotation(fingerprint: str) -> Optional[Dict[str, Any]]:
 def get_annotation(args: AnnotationGetParams) -> Optional[Dict[str, Any]]:
     if args.target_type == "dup_group":
         return _derive_group_annotation(args.target_id)
-    with sqlite3.connect(DB_PATH) as conn:
+    with _read_conn() as conn:
         row = conn.execute(
             """
             SELECT session_id, target_type, target_id, status, human_priority, ai_priority, comment, updated_at
@@ -357,7 +481,7 @@ def list_annotations(args: AnnotationListParams) -> Dict[str, Any]:
         q += " AND (comment IS NULL OR comment = '')"
     q += " ORDER BY updated_at DESC LIMIT ? OFFSET ?"
     params.extend([args.limit, args.offset])
-    with sqlite3.connect(DB_PATH) as conn:
+    with _read_conn() as conn:
         rows = conn.execute(q, params).fetchall()
     items = [
         {
@@ -388,7 +512,7 @@ def _load_status_map(
     statuses = [s for s in statuses if s != "new"]
     status_map: Dict[str, str] = {}
     annotated_ids: Optional[Set[str]] = None
-    with sqlite3.connect(DB_PATH) as conn:
+    with _read_conn() as conn:
         if statuses:
             placeholders = ",".join("?" for _ in statuses)
             q = (
@@ -521,6 +645,7 @@ def init() -> None:
 
 def close() -> None:
     WEAVIATE.close()
+    _close_conns()
 
 
 # --- Chunk access ---
@@ -621,8 +746,7 @@ def _find_chunk_by_id(chunk_id: str) -> Optional[Dict[str, Any]]:
     return None
 
 
-def search_chunks(args: SearchParams) -> Dict[str, Any]:
-    items: List[Dict[str, Any]] = []
+def search_chunks_iter(args: SearchParams) -> Iterator[Dict[str, Any]]:
     dup_map = dup_counts()
     status_map, annotated_ids, exclude_missing = _load_status_map(args.exclude_statuses, "chunk")
 
@@ -644,20 +768,26 @@ def search_chunks(args: SearchParams) -> Dict[str, Any]:
             all_items.sort(key=lambda x: x.path, reverse=reverse)
         else:
             all_items.sort(key=lambda x: x.path, reverse=reverse)
-        sliced = all_items[args.offset: args.offset + args.limit]
-        items = [c.__dict__ for c in sliced]
-        return {"items": items, "count": len(items), "offset": args.offset}
+        for c in all_items[args.offset: args.offset + args.limit]:
+            yield c.__dict__
+        return
 
     skipped = 0
+    emitted = 0
     for obj in _iter_chunks(args.repo):
         if not _matches_search(obj, args, dup_map, status_map, annotated_ids, exclude_missing):
             continue
         if skipped < args.offset:
             skipped += 1
             continue
-        items.append(_chunk_summary(obj, dup_map).__dict__)
-        if len(items) >= args.limit:
+        yield _chunk_summary(obj, dup_map).__dict__
+        emitted += 1
+        if emitted >= args.limit:
             break
+
+
+def search_chunks(args: SearchParams) -> Dict[str, Any]:
+    items = list(search_chunks_iter(args))
     return {"items": items, "count": len(items), "offset": args.offset}
 
 
@@ -731,15 +861,11 @@ def get_dup_group(args: DupGetParams) -> Optional[Dict[str, Any]]:
 
 
 def _base_group_search(args: SearchParams) -> SearchParams:
-    base = SearchParams(**args.__dict__)
-    base.min_dup_count = None
-    base.max_dup_count = None
-    return base
+    return replace(args, min_dup_count=None, max_dup_count=None)
 
 
-def list_dup_groups_filtered(args: SearchParams, min_count: int = 2, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
-    counts: Dict[str, int] = {}
-    sample_ids: Dict[str, List[str]] = {}
+def filtered_group_ids(args: SearchParams) -> Dict[str, List[str]]:
+    groups: Dict[str, List[str]] = {}
     base = _base_group_search(args)
     status_map, annotated_ids, exclude_missing = _load_status_map(base.exclude_statuses, "chunk")
     for obj in _iter_chunks(base.repo):
@@ -748,40 +874,72 @@ def list_dup_groups_filtered(args: SearchParams, min_count: int = 2, limit: int
         fp = obj.get("fingerprint")
         if not fp:
             continue
-        counts[fp] = counts.get(fp, 0) + 1
-        if len(sample_ids.get(fp, [])) < 5:
-            cid = obj.get("chunk_id")
-            if cid:
-                sample_ids.setdefault(fp, []).append(cid)
+        groups.setdefault(fp, []).append(obj.get("chunk_id") or "")
+    return groups
+
+
+def list_dup_groups_filtered(
+    args: SearchParams,
+    min_count: int = 2,
+    limit: int = 50,
+    offset: int = 0,
+    group_ids: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, Any]:
+    if group_ids is None:
+        group_ids = filtered_group_ids(args)
     items = [
-        {"fingerprint": fp, "count": cnt, "chunk_ids": sample_ids.get(fp, [])}
-        for fp, cnt in counts.items()
-        if cnt >= min_count
+        {"fingerprint": fp, "count": len(ids), "chunk_ids": [cid for cid in ids if cid][:5]}
+        for fp, ids in group_ids.items()
+        if len(ids) >= min_count
     ]
     items.sort(key=lambda x: (x["count"], x["fingerprint"]), reverse=True)
     sliced = items[offset: offset + limit]
     return {"items": sliced, "count": len(sliced), "offset": offset}
 
 
-def get_dup_group_filtered(args: DupGetParams, search: SearchParams) -> Optional[Dict[str, Any]]:
+def get_dup_group_filtered_iter(
+    args: DupGetParams,
+    search: SearchParams,
+    chunk_ids: Optional[Iterable[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the group's chunks that pass the filters, with truncated text, as they are found."""
     base = _base_group_search(search)
-    status_map, annotated_ids, exclude_missing = _load_status_map(base.exclude_statuses, "chunk")
+    wanted: Optional[Set[str]] = None
+    if chunk_ids is not None:
+        # Pre-narrowed ids from an earlier filtered listing: skip the filter pass.
+        wanted = set(chunk_ids)
+        if not wanted:
+            return
+        status_map, annotated_ids, exclude_missing = {}, None, False
+    else:
+        status_map, annotated_ids, exclude_missing = _load_status_map(base.exclude_statuses, "chunk")
     fp = args.fingerprint
-    chunks: List[Dict[str, Any]] = []
-    count = 0
     for obj in _iter_chunks(base.repo):
         if obj.get("fingerprint") != fp:
             continue
-        if not _matches_search(obj, base, dup_counts(), status_map, annotated_ids, exclude_missing):
+        if wanted is not None:
+            if obj.get("chunk_id") not in wanted:
+                continue
+        elif not _matches_search(obj, base, dup_counts(), status_map, annotated_ids, exclude_missing):
             continue
-        count += 1
-        chunks.append(
-            {
-                **_chunk_summary(obj, dup_counts()).__dict__,
-                "raw_text": _truncate(obj.get("raw_text", ""), args.chunk_text_max),
-                "raw_text_truncated": len(obj.get("raw_text", "")) > args.chunk_text_max,
-            }
-        )
-    if count == 0:
+        yield {
+            **_chunk_summary(obj, dup_counts()).__dict__,
+            "raw_text": _truncate(obj.get("raw_text", ""), args.chunk_text_max),
+            "raw_text_truncated": len(obj.get("raw_text", "")) > args.chunk_text_max,
+        }
+
+
+def get_dup_group_filtered(
+    args: DupGetParams,
+    search: SearchParams,
+    chunk_ids: Optional[Iterable[str]] = None,
+) -> Optional[Dict[str, Any]]:
+    chunks = list(get_dup_group_filtered_iter(args, search, chunk_ids))
+    if not chunks:
         return None
-    return {"fingerprint": fp, "count": count, "chunk_ids": [c["chunk_id"] for c in chunks], "chunks": chunks}
+    return {
+        "fingerprint": args.fingerprint,
+        "count": len(chunks),
+        "chunk_ids": [c["chunk_id"] for c in chunks],
+        "chunks": chunks,
+    }
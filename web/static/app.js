@@ -0,0 +1,643 @@
+let offset = 0;
+let lastQuery = null;
+let selectedTarget = null;
+let allowHumanPriority = false;
+let lastDupParams = '';
+let currentOpenFingerprint = null;
+let currentGroupChunkIds = [];
+const groupStatus = new Map();
+const dupRowByFp = new Map();
+const chunkRowById = new Map();
+let prevOpenRow = null;
+let currentGroupPills = [];
+
+// Row markup is parsed once; rows are cloned from these and filled via textContent.
+const dupRowTpl = document.createElement('template');
+dupRowTpl.innerHTML = `<div class="dup-item">
+  <div class="mono dup-item-fp"></div>
+  <div class="muted dup-item-size"></div>
+  <div class="dup-actions">
+    <button class="btn" data-open>Open</button>
+    <div class="status-actions">
+      <button class="status-btn todo" data-status="todo">2do</button>
+      <button class="status-btn skip" data-status="skip">skip</button>
+      <button class="status-btn done" data-status="done">done</button>
+      <button class="status-btn comment" data-comment>comment</button>
+    </div>
+  </div>
+  <div class="group-comment" data-comment-editor style="display:none;">
+    <textarea placeholder="comment for this group"></textarea>
+    <div class="actions">
+      <button class="btn" data-comment-save>Ok</button>
+      <button class="btn ghost" data-comment-cancel>Cancel</button>
+    </div>
+  </div>
+</div>`;
+const chunkRowTpl = document.createElement('template');
+chunkRowTpl.innerHTML = `<div class="dup-item">
+  <div class="mono path"></div>
+  <div class="muted">tokens: <span data-tokens></span> · dup_count: <span data-dups></span> · <span class="status-pill">?</span></div>
+  <pre class="mono" style="white-space:pre-wrap; background:#0b1224; color:#e2e8f0; padding:8px; border-radius:8px;"><code class="language-plaintext"></code></pre>
+  <button class="btn ghost" data-inspect>Inspect chunk</button>
+</div>`;
+const resultRowTpl = document.createElement('template');
+resultRowTpl.innerHTML = `<table><tr>
+  <td class="mono"></td>
+  <td><span class="pill"></span></td>
+  <td></td>
+  <td></td>
+  <td></td>
+  <td class="mono"></td>
+</tr></table>`;
+
+function qs(id){ return document.getElementById(id); }
+const groupDetailsEl = qs('groupDetails');
+const annStatusEl = qs('annStatus');
+
+// One shared timer clears the status line, so rapid actions do not stack timeouts.
+const statusLineEl = qs('statusLine');
+let statusClearTimer = 0;
+function showStatus(msg){
+  clearTimeout(statusClearTimer);
+  statusLineEl.textContent = msg;
+}
+function flashStatus(msg){
+  showStatus(msg);
+  statusClearTimer = setTimeout(() => { statusLineEl.textContent = ''; }, 1600);
+}
+
+// Group chunks are highlighted only once they scroll into view, and then in idle time.
+const highlighted = new WeakSet();
+const whenIdle = window.requestIdleCallback || (cb => setTimeout(cb, 1));
+function highlightCode(code){
+  if(!window.hljs || highlighted.has(code)) return;
+  highlighted.add(code);
+  hljs.highlightElement(code);
+}
+const highlightObserver = new IntersectionObserver(entries => {
+  for(const entry of entries){
+    if(!entry.isIntersecting) continue;
+    highlightObserver.unobserve(entry.target);
+    whenIdle(() => highlightCode(entry.target), {timeout: 200});
+  }
+});
+function langClass(lang){
+  const map = {
+    'c_sharp': 'csharp',
+    'c#': 'csharp',
+    'cpp': 'cpp',
+    'c++': 'cpp',
+    'ts': 'typescript',
+    'tsx': 'tsx',
+    'jsx': 'javascript',
+    'js': 'javascript',
+    'py': 'python',
+    'rb': 'ruby',
+    'yml': 'yaml',
+  };
+  const key = (lang || '').toLowerCase();
+  return map[key] || key || 'plaintext';
+}
+
+function getExcludedStatuses(){
+  const excluded = [];
+  if(!qs('statusNew').checked) excluded.push('new');
+  if(!qs('statusTodo').checked) excluded.push('todo');
+  if(!qs('statusSkip').checked) excluded.push('skip');
+  if(!qs('statusDone').checked) excluded.push('done');
+  return excluded;
+}
+
+async function fetchJSON(url, options){
+  const res = await fetch(url, options);
+  if(!res.ok){
+    const text = await res.text();
+    throw new Error(text || res.statusText);
+  }
+  return await res.json();
+}
+
+// Small LRU of GET responses so clicking back and forth between groups skips the round-trip.
+// Entries with a TTL expire on their own; writes invalidate the keys they affect.
+const respCache = new Map();
+const CACHE_MAX = 64;
+const ANN_TTL_MS = 5000;
+
+async function cachedFetchJSON(key, url, opts, ttlMs = 0){
+  const hit = respCache.get(key);
+  if(hit && (!hit.expires || hit.expires > Date.now())){
+    respCache.delete(key);
+    respCache.set(key, hit);
+    return hit.value;
+  }
+  const value = await fetchJSON(url, opts);
+  respCache.delete(key);
+  respCache.set(key, {value, expires: ttlMs ? Date.now() + ttlMs : 0});
+  if(respCache.size > CACHE_MAX){
+    respCache.delete(respCache.keys().next().value);
+  }
+  return value;
+}
+
+function invalidateGroup(fp){
+  respCache.delete('dup:' + fp);
+  respCache.delete('ann:' + fp);
+}
+
+// Chunk statuses are remembered for a few seconds, and ids requested within the same
+// tick share one bulk_get; ids already in flight wait on that request instead of refetching.
+const STATUS_TTL_MS = 5000;
+const knownStatuses = new Map();
+const statusInflight = new Map();
+let pendingStatusIds = null;
+let pendingStatusBatch = null;
+
+function rememberStatus(chunkId, status){
+  knownStatuses.set(chunkId, {status: status || '', expires: Date.now() + STATUS_TTL_MS});
+}
+
+function queueStatusIds(ids){
+  if(!pendingStatusIds){
+    const batch = pendingStatusIds = new Set();
+    pendingStatusBatch = Promise.resolve().then(() => {
+      pendingStatusIds = null;
+      const targetIds = Array.from(batch);
+      return fetchJSON('/api/annotations/bulk_get', {
+        method: 'POST',
+        headers: {'content-type': 'application/json'},
+        body: JSON.stringify({target_type: 'chunk', target_ids: targetIds}),
+      }).then(data => {
+        targetIds.forEach(cid => rememberStatus(cid, ''));
+        (data.items || []).forEach(item => {
+          if(item?.target_id){ rememberStatus(item.target_id, item.status); }
+        });
+      }).finally(() => {
+        targetIds.forEach(cid => statusInflight.delete(cid));
+      });
+    });
+  }
+  ids.forEach(cid => {
+    pendingStatusIds.add(cid);
+    statusInflight.set(cid, pendingStatusBatch);
+  });
+  return pendingStatusBatch;
+}
+
+async function fetchChunkStatuses(chunkIds, opts = {}){
+  if(!chunkIds?.length){ return {}; }
+  const now = Date.now();
+  const waits = new Set();
+  const missing = [];
+  for(const cid of chunkIds){
+    if(!cid) continue;
+    const known = knownStatuses.get(cid);
+    if(known && known.expires > now) continue;
+    const inflight = statusInflight.get(cid);
+    if(inflight){ waits.add(inflight); } else { missing.push(cid); }
+  }
+  if(missing.length){ waits.add(queueStatusIds(missing)); }
+  if(waits.size){ await Promise.all(waits); }
+  // The request may be shared with other callers, so a superseded caller bails out here instead.
+  opts.signal?.throwIfAborted();
+  const map = {};
+  for(const cid of chunkIds){
+    const known = knownStatuses.get(cid);
+    if(known){ map[cid] = known.status; }
+  }
+  return map;
+}
+
+async function refreshOpenGroupStatuses(opts = {}){
+  if(!currentGroupChunkIds.length){ return; }
+  const statusMap = await fetchChunkStatuses(currentGroupChunkIds, opts);
+  for(const [cid, item] of chunkRowById){
+    paintPill(item._pill, statusMap[cid]);
+  }
+  if(selectedTarget?.type === 'chunk'){
+    const status = statusMap[selectedTarget.id];
+    if(status !== undefined){
+      annStatusEl.value = status || '';
+    }
+  }
+}
+
+async function loadStats(){
+  const boot = await fetchJSON('/api/bootstrap');
+  const health = boot.health;
+  allowHumanPriority = !!health.allow_human_priority_update;
+  qs('annHuman').disabled = !allowHumanPriority;
+  if(!allowHumanPriority){ qs('annHint').textContent = 'human_priority disabled'; }
+
+  const statsResp = boot.stats;
+  if(!statsResp.ok){
+    qs('statsGrid').innerHTML = '<div class="muted">No stats.json yet</div>';
+    return;
+  }
+  const data = statsResp.data;
+  qs('repoBadge').textContent = data.repo || 'repo';
+  const stats = [
+    {label:'Files scanned', value: data.files_scanned || 0},
+    {label:'Chunks extracted', value: data.chunks_extracted || 0},
+    {label:'Duration (s)', value: data.duration_seconds || 0},
+  ];
+  qs('statsGrid').innerHTML = stats.map(s => `
+    <div class="stat"><h4>${s.label}</h4><p>${s.value}</p></div>
+  `).join('');
+
+  const langSelect = qs('languageSelect');
+  const langs = boot.languages || [];
+  langSelect.innerHTML = '<option value="">Any</option>' + langs.map(l => `<option value="${l}">${l}</option>`).join('');
+}
+
+function buildFilterParams(){
+  const params = new URLSearchParams();
+  const fields = {
+    path_contains: qs('pathContains').value,
+    language: qs('languageSelect').value,
+    node_type: qs('nodeType').value,
+    text_contains: qs('textContains').value,
+    normalized_contains: qs('normContains').value,
+    fingerprint: qs('fingerprint').value,
+    min_tokens: qs('minTokens').value,
+    max_tokens: qs('maxTokens').value,
+    min_lines: qs('minLines').value,
+    max_lines: qs('maxLines').value,
+    min_dup_count: qs('minDup').value,
+    max_dup_count: qs('maxDup').value,
+    sort_by: qs('sortBy').value,
+    sort_order: qs('sortOrder').value,
+  };
+  for(const [k,v] of Object.entries(fields)){
+    if(v !== '' && v !== null && v !== undefined){ params.set(k, v); }
+  }
+  const excluded = getExcludedStatuses();
+  if(excluded.length){ params.set('exclude_statuses', excluded.join(',')); }
+  return params;
+}
+
+function buildQuery(resetOffset=false){
+  if(resetOffset){ offset = 0; }
+  const params = buildFilterParams();
+  params.set('limit', 50);
+  params.set('offset', offset);
+  return params;
+}
+
+async function loadChunks(reset=false, opts = {}){
+  const params = buildQuery(reset);
+  lastQuery = params.toString();
+  showStatus('Loading...');
+  const data = await fetchJSON('/api/chunks/search?' + params.toString(), opts);
+  showStatus('');
+
+  if(reset){ qs('chunksTable').querySelector('tbody').innerHTML = ''; }
+  const tbody = qs('chunksTable').querySelector('tbody');
+  const rowTpl = resultRowTpl.content.querySelector('tr');
+  const frag = document.createDocumentFragment();
+  for(const item of data.items){
+    const tr = rowTpl.cloneNode(true);
+    const cells = tr.cells;
+    cells[0].textContent = item.path + ':' + item.start_line + '-' + item.end_line;
+    cells[1].firstElementChild.textContent = item.language ?? '';
+    cells[2].textContent = item.line_count;
+    cells[3].textContent = item.token_estimate;
+    cells[4].textContent = item.dup_count;
+    cells[5].textContent = item.fingerprint.slice(0, 10) + '…';
+    tr.onclick = () => selectChunk(item.chunk_id, item);
+    frag.appendChild(tr);
+  }
+  tbody.appendChild(frag);
+  offset += data.items.length;
+  qs('resultMeta').textContent = `${offset} результатов`;
+  qs('pageInfo').textContent = `offset ${offset}`;
+}
+
+async function selectChunk(chunkId, summary){
+  selectedTarget = {type: 'chunk', id: chunkId};
+  qs('selectedMeta').textContent = summary ? `${summary.path}:${summary.start_line}-${summary.end_line}` : chunkId;
+  const text = await fetchJSON(`/api/chunks/text?chunk_id=${encodeURIComponent(chunkId)}&max_length=2400`);
+  const codeEl = qs('chunkPreview');
+  const lang = summary?.language || text.language || 'plaintext';
+  codeEl.className = `language-${langClass(lang)}`;
+  codeEl.textContent = text.raw_text || '';
+  if (window.hljs) { hljs.highlightElement(codeEl); }
+  await loadAnnotation();
+}
+
+async function loadAnnotation(target = selectedTarget){
+  if(!target) return;
+  const url = `/api/annotations/get?target_type=${target.type}&target_id=${encodeURIComponent(target.id)}`;
+  const data = target.type === 'dup_group'
+    ? await cachedFetchJSON('ann:' + target.id, url, undefined, ANN_TTL_MS)
+    : await fetchJSON(url);
+  // openGroup fetches the group annotation alongside the group itself; if the user has
+  // moved on to another target meanwhile, this response must not overwrite the panel.
+  if(selectedTarget !== target){ return; }
+  const item = data.item || {};
+  annStatusEl.value = item.status || '';
+  qs('annAi').value = item.ai_priority ?? '';
+  qs('annHuman').value = item.human_priority ?? '';
+  qs('annComment').value = item.comment || '';
+}
+
+async function saveAnnotation(){
+  if(!selectedTarget){ return; }
+  const payload = {
+    target_type: selectedTarget.type,
+    target_id: selectedTarget.id,
+    status: annStatusEl.value || null,
+    ai_priority: qs('annAi').value ? parseInt(qs('annAi').value) : null,
+    human_priority: qs('annHuman').value ? parseInt(qs('annHuman').value) : null,
+    comment: qs('annComment').value || null,
+  };
+  const res = await fetchJSON('/api/annotations/set', {
+    method: 'POST',
+    headers: {'content-type': 'application/json'},
+    body: JSON.stringify(payload),
+  });
+  if(currentOpenFingerprint){ invalidateGroup(currentOpenFingerprint); }
+  // The server keeps the stored status when none is sent, so the response, not the
+  // payload, says what the status is now.
+  const savedStatus = res.status || '';
+  if(selectedTarget.type === 'chunk'){ rememberStatus(selectedTarget.id, savedStatus); }
+  if(selectedTarget.type === 'dup_group'){
+    const fp = selectedTarget.id;
+    invalidateGroup(fp);
+    // A status is copied onto every chunk in the group, as setGroupStatus does;
+    // without one the chunks keep their own.
+    if(payload.status){
+      if(currentOpenFingerprint === fp){
+        currentGroupChunkIds.forEach(cid => rememberStatus(cid, savedStatus));
+        for(const pill of currentGroupPills){ paintPill(pill, savedStatus); }
+      }else{
+        knownStatuses.clear();
+      }
+    }
+    if(savedStatus){ groupStatus.set(fp, savedStatus); }else{ groupStatus.delete(fp); }
+    const row = dupRowByFp.get(fp);
+    if(row){ updateGroupRow(row, savedStatus, currentOpenFingerprint === fp); }
+  }
+  qs('annHint').textContent = 'saved';
+  setTimeout(() => qs('annHint').textContent = '', 1500);
+  if(res.human_priority_allowed === false){
+    qs('annHuman').value = res.human_priority ?? '';
+  }
+}
+
+async function loadDupGroups(opts = {}){
+  const min = qs('dupMin').value || 2;
+  const limit = qs('dupLimit').value || 30;
+  const offsetLocal = qs('dupOffset').value || 0;
+  const params = buildFilterParams();
+  params.set('min_count', min);
+  params.set('limit', limit);
+  params.set('offset', offsetLocal);
+  lastDupParams = params.toString();
+  const data = await fetchJSON(`/api/dups/list_filtered?${params.toString()}`, opts);
+  qs('dupMeta').textContent = `${data.count} групп`;
+  const list = qs('dupList');
+  const frag = document.createDocumentFragment();
+  dupRowByFp.clear();
+  const chunkIds = [];
+  const chunkToGroup = new Map();
+  const openFp = currentOpenFingerprint;
+  const gs = groupStatus;
+  data.items.forEach(item => {
+    const div = dupRowTpl.content.firstElementChild.cloneNode(true);
+    div.dataset.fp = item.fingerprint;
+    div.querySelector('.dup-item-fp').textContent = item.fingerprint;
+    div.querySelector('.dup-item-size').textContent = 'size: ' + item.count;
+    dupRowByFp.set(item.fingerprint, div);
+    // Keep direct references so status/open updates never re-query the row.
+    div._openBtn = div.querySelector('[data-open]');
+    div._statusBtns = Array.from(div.querySelectorAll('.status-btn[data-status]'));
+    updateGroupRow(div, gs.get(item.fingerprint) || '', item.fingerprint === openFp);
+    frag.appendChild(div);
+    (item.chunk_ids || []).forEach(cid => {
+      if(!cid) return;
+      chunkIds.push(cid);
+      chunkToGroup.set(cid, item.fingerprint);
+    });
+  });
+  list.replaceChildren(frag);
+  prevOpenRow = dupRowByFp.get(currentOpenFingerprint) || null;
+  if(chunkIds.length){
+    const statusMap = await fetchChunkStatuses(chunkIds, opts);
+    for(const [cid, status] of Object.entries(statusMap)){
+      if(!status) continue;
+      const fp = chunkToGroup.get(cid);
+      if(!fp || groupStatus.has(fp)) continue;
+      groupStatus.set(fp, status);
+      const row = dupRowByFp.get(fp);
+      if(row){ updateGroupRow(row, status, currentOpenFingerprint === fp); }
+    }
+  }
+}
+
+function updateGroupRow(div, status, isOpen){
+  div.classList.toggle('is-open', !!isOpen);
+  div._openBtn.classList.toggle('open-active', !!isOpen);
+  div._statusBtns.forEach(btn => {
+    const isMatch = status && btn.dataset.status === status;
+    btn.classList.toggle('is-active', !!isMatch);
+    btn.classList.toggle('is-inactive', !!status && !isMatch);
+  });
+}
+
+async function setGroupStatus(fp, status){
+  if(!fp || !status){ return; }
+  showStatus('Updating group...');
+  await fetchJSON('/api/annotations/set_group_status?fingerprint=' + encodeURIComponent(fp), {
+    method: 'POST',
+    headers: {'content-type': 'application/json'},
+    body: JSON.stringify({status}),
+  });
+  invalidateGroup(fp);
+  if(currentOpenFingerprint === fp){
+    currentGroupChunkIds.forEach(cid => rememberStatus(cid, status));
+  }else{
+    // Only the open group's full chunk list is known here; drop everything else.
+    knownStatuses.clear();
+  }
+  groupStatus.set(fp, status);
+  const row = dupRowByFp.get(fp);
+  if(row){ updateGroupRow(row, status, currentOpenFingerprint === fp); }
+  if(currentOpenFingerprint === fp){
+    for(const pill of currentGroupPills){ paintPill(pill, status); }
+    if(selectedTarget?.type === 'chunk'){
+      annStatusEl.value = status;
+    }
+  }
+  flashStatus(`group ${fp.slice(0, 8)}… -> ${status}`);
+}
+
+async function toggleGroupComment(fp, row){
+  const editor = row.querySelector('[data-comment-editor]');
+  if(!editor){ return; }
+  const isOpen = editor.style.display !== 'none';
+  if(isOpen){
+    editor.style.display = 'none';
+    return;
+  }
+  editor.style.display = 'block';
+  let current = '';
+  try{
+    const data = await cachedFetchJSON(
+      'ann:' + fp,
+      `/api/annotations/get?target_type=dup_group&target_id=${encodeURIComponent(fp)}`,
+      undefined,
+      ANN_TTL_MS,
+    );
+    current = data?.item?.comment || '';
+  }catch(_){}
+  const textarea = editor.querySelector('textarea');
+  if(textarea){ textarea.value = current; textarea.focus(); }
+}
+
+async function saveGroupComment(fp, row){
+  const editor = row.querySelector('[data-comment-editor]');
+  const textarea = editor.querySelector('textarea');
+  const comment = textarea ? textarea.value : '';
+  showStatus('Updating comment...');
+  await fetchJSON('/api/annotations/set', {
+    method: 'POST',
+    headers: {'content-type': 'application/json'},
+    body: JSON.stringify({target_type: 'dup_group', target_id: fp, comment: comment || null}),
+  });
+  invalidateGroup(fp);
+  flashStatus(`group ${fp.slice(0, 8)}… comment updated`);
+  editor.style.display = 'none';
+}
+
+const GROUP_QUERY = 'include_chunks=true&chunk_text_max=1000';
+const INITIAL_CHUNK_ROWS = 10;
+const CHUNK_ROWS_PER_FRAME = 20;
+let groupRenderFrame = 0;
+
+function paintPill(pill, status){
+  pill.textContent = status || '-';
+  pill.className = `status-pill ${status || ''}`.trim();
+}
+
+async function openGroup(fp){
+  // The group and its annotation are independent requests: start both before awaiting either.
+  const target = {type: 'dup_group', id: fp};
+  const dupPromise = cachedFetchJSON('dup:' + fp, `/api/dups/get?${GROUP_QUERY}&fingerprint=${encodeURIComponent(fp)}`);
+  const annPromise = loadAnnotation(target);
+  selectedTarget = target;
+  currentOpenFingerprint = fp;
+  const data = await dupPromise;
+  if(currentOpenFingerprint !== fp){ return; }
+  // Only the previously open row and the new one change state.
+  const newRow = dupRowByFp.get(fp) || null;
+  if(prevOpenRow && prevOpenRow !== newRow){
+    updateGroupRow(prevOpenRow, groupStatus.get(prevOpenRow.dataset.fp) || '', false);
+  }
+  if(newRow){ updateGroupRow(newRow, groupStatus.get(fp) || '', true); }
+  prevOpenRow = newRow;
+  qs('groupMeta').textContent = `fingerprint ${fp} · size ${data.count}`;
+  const container = groupDetailsEl;
+  cancelAnimationFrame(groupRenderFrame);
+  chunkRowById.clear();
+  currentGroupPills = [];
+  highlightObserver.disconnect();
+  currentGroupChunkIds = data.chunks.map(c => c.chunk_id);
+  let statusMap = null;
+  const statusPromise = fetchChunkStatuses(currentGroupChunkIds);
+  const mount = (parent, ch) => {
+    const item = chunkRowTpl.content.firstElementChild.cloneNode(true);
+    item.dataset.chunkId = ch.chunk_id;
+    chunkRowById.set(ch.chunk_id, item);
+    item.querySelector('.path').textContent = ch.path + ':' + ch.start_line + '-' + ch.end_line;
+    item.querySelector('[data-tokens]').textContent = ch.token_estimate;
+    item.querySelector('[data-dups]').textContent = ch.dup_count;
+    item._pill = item.querySelector('.status-pill');
+    currentGroupPills.push(item._pill);
+    const code = item.querySelector('code');
+    if (code) {
+      code.className = `language-${langClass(ch.language || 'plaintext')}`;
+      code.textContent = ch.raw_text || '';
+      highlightObserver.observe(code);
+    }
+    item._chunk = ch;
+    // Rows mounted after the statuses arrived read knownStatuses, which setGroupStatus keeps current.
+    if(statusMap){ paintPill(item._pill, knownStatuses.get(ch.chunk_id)?.status ?? statusMap[ch.chunk_id]); }
+    parent.appendChild(item);
+  };
+  // Mount the first rows right away, then the rest a batch per frame so paint and input
+  // are not blocked by large groups. Opening another group cancels the pending frames.
+  let i = 0;
+  const first = document.createDocumentFragment();
+  for(; i < INITIAL_CHUNK_ROWS && i < data.chunks.length; i++){ mount(first, data.chunks[i]); }
+  container.replaceChildren(first);
+  const step = () => {
+    if(currentOpenFingerprint !== fp){ return; }
+    const frag = document.createDocumentFragment();
+    for(let k = 0; k < CHUNK_ROWS_PER_FRAME && i < data.chunks.length; k++, i++){ mount(frag, data.chunks[i]); }
+    container.appendChild(frag);
+    if(i < data.chunks.length){ groupRenderFrame = requestAnimationFrame(step); }
+  };
+  if(i < data.chunks.length){ groupRenderFrame = requestAnimationFrame(step); }
+  statusMap = await statusPromise;
+  if(currentOpenFingerprint !== fp){ return; }
+  for(const [cid, item] of chunkRowById){
+    paintPill(item._pill, statusMap[cid]);
+  }
+  await annPromise;
+  if(data.chunks.length){
+    await selectChunk(data.chunks[0].chunk_id, data.chunks[0]);
+  }
+}
+
+// One delegated listener per list instead of per-row handlers.
+qs('dupList').addEventListener('click', e => {
+  const row = e.target.closest('.dup-item');
+  if(!row) return;
+  const fp = row.dataset.fp;
+  if(e.target.closest('[data-open]')) openGroup(fp);
+  else if(e.target.closest('.status-btn[data-status]')) setGroupStatus(fp, e.target.closest('[data-status]').dataset.status);
+  else if(e.target.closest('[data-comment]')) toggleGroupComment(fp, row);
+  else if(e.target.closest('[data-comment-save]')) saveGroupComment(fp, row);
+  else if(e.target.closest('[data-comment-cancel]')) row.querySelector('[data-comment-editor]').style.display = 'none';
+});
+groupDetailsEl.addEventListener('click', e => {
+  if(!e.target.closest('[data-inspect]')) return;
+  const item = e.target.closest('[data-chunk-id]');
+  if(item){ selectChunk(item.dataset.chunkId, item._chunk); }
+});
+
+// Filter changes are debounced; a newer apply aborts the requests of the previous one.
+let applyTimer = 0;
+let applyController = null;
+function scheduleApply(){
+  clearTimeout(applyTimer);
+  applyTimer = setTimeout(runApply, 180);
+}
+async function runApply(){
+  applyController?.abort();
+  applyController = new AbortController();
+  const opts = {signal: applyController.signal};
+  try{
+    // Independent endpoints with no shared state between them: run concurrently.
+    await Promise.all([loadChunks(true, opts), loadDupGroups(opts), refreshOpenGroupStatuses(opts)]);
+  }catch(err){
+    if(err.name !== 'AbortError'){ throw err; }
+  }
+}
+qs('applyFilters').onclick = scheduleApply;
+qs('chunkFilters').addEventListener('input', scheduleApply);
+// Filter controls are looked up once; reset only writes their values.
+const resetTargets = ['pathContains','nodeType','textContains','normContains','fingerprint','minTokens','maxTokens','minLines','maxLines','minDup','maxDup','languageSelect','sortBy'].map(qs);
+const resetChecks = ['statusNew','statusTodo','statusSkip','statusDone'].map(qs);
+const sortOrderEl = qs('sortOrder');
+qs('resetFilters').onclick = () => {
+  for(const el of resetTargets){ el.value = ''; }
+  sortOrderEl.value = 'desc';
+  for(const el of resetChecks){ el.checked = true; }
+  loadChunks(true);
+};
+qs('loadMore').onclick = () => loadChunks(false);
+qs('saveAnnotation').onclick = saveAnnotation;
+qs('loadDups').onclick = () => loadDupGroups();
+
+loadStats().then(() => Promise.all([loadChunks(true), loadDupGroups()]));